@@ -0,0 +1,220 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple
+
+# --- Constants ---
+
+# Lower value = served first. Refinements edit a roadmap the user is already
+# looking at, so they jump ahead of brand new generations.
+PRIORITY_REFINE = 0
+PRIORITY_CONTINUE = 1
+PRIORITY_GENERATE = 2
+
+# Buckets that have been idle this long are dropped to keep memory bounded.
+BUCKET_IDLE_SECONDS = 600
+# Weight of the newest sample in the moving average of Cortex service time.
+SERVICE_TIME_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being queued or served."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """A classic token bucket: `rate` tokens per second, up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def try_take(self, now: float) -> float:
+        """
+        Takes a single token if one is available.
+
+        Returns:
+            0.0 on success, otherwise the seconds until the next token is due.
+        """
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        """Returns a token taken for a request that was shed rather than served."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class AdmissionController:
+    """
+    Bounded priority queue in front of the Cortex-bound endpoints.
+
+    At most `max_concurrent` requests run the LLM call at once. Up to
+    `max_queue` more wait for a slot, ordered by priority and then arrival.
+    Anything beyond that, or any client over its token-bucket budget, is
+    rejected immediately with a Retry-After hint derived from the observed
+    service rate.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, max_wait: float,
+                 client_rate: float, client_burst: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+
+        self._cond = asyncio.Condition()
+        self._heap: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._last_bucket_sweep = time.monotonic()
+        # Seeded with a pessimistic guess until real Cortex calls are observed.
+        self._avg_service_time = 10.0
+
+        self._metrics = {
+            "admitted_total": 0,
+            "rejected_queue_full_total": 0,
+            "rejected_rate_limited_total": 0,
+            "rejected_timeout_total": 0,
+            "queue_wait_seconds_sum": 0.0,
+            "queue_wait_seconds_count": 0,
+            "queue_wait_seconds_max": 0.0,
+        }
+
+    # --- Internal helpers (callers must hold self._cond) ---
+
+    def _service_rate(self) -> float:
+        """Requests per second the backend is currently completing."""
+        return self.max_concurrent / max(self._avg_service_time, 0.001)
+
+    def _retry_after(self, ahead: int) -> int:
+        return max(1, math.ceil((ahead + 1) / self._service_rate()))
+
+    def _check_rate_limit(self, client_id: str, now: float) -> TokenBucket:
+        if now - self._last_bucket_sweep > BUCKET_IDLE_SECONDS:
+            self._buckets = {k: b for k, b in self._buckets.items()
+                             if now - b.updated_at < BUCKET_IDLE_SECONDS}
+            self._last_bucket_sweep = now
+
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = TokenBucket(
+                self.client_rate, self.client_burst)
+        wait = bucket.try_take(now)
+        if wait:
+            self._metrics["rejected_rate_limited_total"] += 1
+            raise AdmissionRejected(
+                "Too many requests from this client. Please slow down.",
+                max(1, math.ceil(wait)))
+        return bucket
+
+    def _record_wait(self, waited: float) -> None:
+        self._metrics["admitted_total"] += 1
+        self._metrics["queue_wait_seconds_sum"] += waited
+        self._metrics["queue_wait_seconds_count"] += 1
+        self._metrics["queue_wait_seconds_max"] = max(
+            self._metrics["queue_wait_seconds_max"], waited)
+
+    # --- Public API ---
+
+    @asynccontextmanager
+    async def admit(self, client_id: str, priority: int) -> AsyncIterator[None]:
+        """
+        Waits until the caller may run its LLM call, then holds the slot
+        for the duration of the `async with` block.
+
+        Args:
+            client_id: Key for the per-client token bucket (usually the IP).
+            priority: One of the PRIORITY_* constants; lower runs first.
+
+        Raises:
+            AdmissionRejected: If the client is rate limited, the queue is
+                full, or no slot frees up within `max_wait` seconds.
+        """
+        enqueued_at = time.monotonic()
+        async with self._cond:
+            must_queue = self._in_flight >= self.max_concurrent or self._heap
+            # Capacity is checked first so requests shed here don't spend the
+            # client's rate-limit budget.
+            if must_queue and len(self._heap) >= self.max_queue:
+                self._metrics["rejected_queue_full_total"] += 1
+                raise AdmissionRejected(
+                    "The server is busy. Please try again shortly.",
+                    self._retry_after(len(self._heap)))
+            bucket = self._check_rate_limit(client_id, enqueued_at)
+
+            if must_queue:
+                ticket = (priority, next(self._seq))
+                heapq.heappush(self._heap, ticket)
+                deadline = enqueued_at + self.max_wait
+                while self._heap[0] != ticket or self._in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._heap.remove(ticket)
+                        heapq.heapify(self._heap)
+                        self._metrics["rejected_timeout_total"] += 1
+                        bucket.refund()
+                        self._cond.notify_all()
+                        raise AdmissionRejected(
+                            "The server is busy. Please try again shortly.",
+                            self._retry_after(len(self._heap)))
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    except asyncio.CancelledError:
+                        # The client went away; don't leave a dead ticket at the head.
+                        self._heap.remove(ticket)
+                        heapq.heapify(self._heap)
+                        bucket.refund()
+                        self._cond.notify_all()
+                        raise
+                heapq.heappop(self._heap)
+
+            self._in_flight += 1
+            # Several slots may have been freed at once; the next waiter may
+            # already have woken, seen it wasn't the head, and gone back to sleep.
+            if self._heap and self._in_flight < self.max_concurrent:
+                self._cond.notify_all()
+            started_at = time.monotonic()
+            self._record_wait(started_at - enqueued_at)
+
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._in_flight -= 1
+                elapsed = time.monotonic() - started_at
+                self._avg_service_time += SERVICE_TIME_EWMA_ALPHA * \
+                    (elapsed - self._avg_service_time)
+                self._cond.notify_all()
+
+    def render_metrics(self) -> str:
+        """Renders the controller's counters and gauges in Prometheus text format."""
+        snapshot = dict(self._metrics)
+        snapshot["queue_depth"] = len(self._heap)
+        snapshot["in_flight"] = self._in_flight
+        snapshot["service_time_seconds_avg"] = self._avg_service_time
+
+        lines = []
+        for name, value in snapshot.items():
+            metric = f"roadmap_admission_{name}"
+            kind = "counter" if name.endswith(("_total", "_sum", "_count")) else "gauge"
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,92 @@
+# bench_skill_pruning.py
+#
+# Measures how much the skill-index skip list saves on initial roadmap
+# generation. Each fixture resume is generated without and with known topics
+# in the prompt, several rounds each with the order alternating, and the
+# median output tokens and latency of the two variants are compared.
+#
+# Usage: python bench_skill_pruning.py [fixtures/resumes.json] [rounds]
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from extraction import extract_skills
+import server
+
+FIXTURES_PATH = os.path.join(server.BASE_DIR, 'fixtures', 'resumes.json')
+DEFAULT_ROUNDS = 3
+
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with the same tokenizer Cortex bills the model with."""
+    safe_text = server.escape_sql_string(text)
+    sql_query = f"SELECT SNOWFLAKE.CORTEX.COUNT_TOKENS('{server.SNOWFLAKE_MODEL}', '{safe_text}') as tokens"
+    return int(server.get_session().sql(sql_query).collect()[0]['TOKENS'])
+
+
+async def measure(prompt: str, known: int) -> dict:
+    """
+    Runs one generation and returns its latency, the billed output tokens of
+    the raw model text, and how many topics post-generation pruning removes.
+    """
+    started_at = time.perf_counter()
+    response_text = await server.run_cortex_complete(server.build_complete_sql(prompt))
+    latency = time.perf_counter() - started_at
+    sample = {"latency": latency, "tokens": count_tokens(response_text), "leftovers": None}
+    try:
+        sample["leftovers"] = server.skill_index.prune_roadmap(
+            server.parse_roadmap_response(response_text), known)
+    except ValueError:
+        pass  # Still billed; counted, but nothing to prune.
+    return sample
+
+
+async def main(path: str, rounds: int) -> None:
+    with open(path, encoding='utf-8') as f:
+        fixtures = json.load(f)
+
+    totals = {"base_tokens": 0.0, "pruned_tokens": 0.0, "base_latency": 0.0, "pruned_latency": 0.0}
+    print(f"{'fixture':<24}{'known':>6}{'median tokens':>18}{'median latency (s)':>22}{'leftovers':>11}")
+    for fixture in fixtures:
+        known = server.skill_index.known_mask(extract_skills(fixture['resume']))
+        prompts = {
+            "base": server.build_initial_prompt(fixture['prompt'], fixture['resume'], 0),
+            "pruned": server.build_initial_prompt(fixture['prompt'], fixture['resume'], known),
+        }
+        samples = {"base": [], "pruned": []}
+        for round_idx in range(rounds):
+            # Alternate which variant goes first so warehouse warm-up and
+            # drifting load don't consistently favour one of them.
+            order = ("base", "pruned") if round_idx % 2 == 0 else ("pruned", "base")
+            for variant in order:
+                samples[variant].append(await measure(prompts[variant], known))
+
+        medians = {variant: {key: statistics.median(s[key] for s in runs)
+                             for key in ("tokens", "latency")}
+                   for variant, runs in samples.items()}
+        leftovers = [s["leftovers"] for s in samples["pruned"] if s["leftovers"] is not None]
+        for variant in ("base", "pruned"):
+            totals[f"{variant}_tokens"] += medians[variant]["tokens"]
+            totals[f"{variant}_latency"] += medians[variant]["latency"]
+        print(f"{fixture['name']:<24}{bin(known).count('1'):>6}"
+              f"{medians['base']['tokens']:>9.0f}{medians['pruned']['tokens']:>9.0f}"
+              f"{medians['base']['latency']:>11.1f}{medians['pruned']['latency']:>11.1f}"
+              f"{(statistics.mean(leftovers) if leftovers else 0):>11.1f}")
+
+    if totals["base_tokens"]:
+        token_saving = 1 - totals["pruned_tokens"] / totals["base_tokens"]
+        latency_saving = 1 - totals["pruned_latency"] / totals["base_latency"]
+        print(f"\nOutput tokens ({rounds} rounds, sum of medians): "
+              f"{totals['base_tokens']:.0f} -> {totals['pruned_tokens']:.0f} ({token_saving:.1%} fewer)")
+        print(f"Latency ({rounds} rounds, sum of medians): "
+              f"{totals['base_latency']:.1f}s -> {totals['pruned_latency']:.1f}s ({latency_saving:.1%} faster)")
+
+
+if __name__ == "__main__":
+    server.get_session()
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else FIXTURES_PATH,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ROUNDS))
@@ -0,0 +1,79 @@
+import io
+import logging
+import re
+from typing import Any, Dict, List
+
+import fitz  # PyMuPDF
+import docx
+
+logger = logging.getLogger(__name__)
+
+# Predefined skills list
+SKILLS = [
+    "Python", "C++", "Java", "JavaScript", "React", "Node.js", "Express.js", "MongoDB",
+    "SQL", "R", "Matlab", "Git", "Docker", "Kubernetes", "AWS", "HTML", "CSS",
+    "Machine Learning", "Deep Learning", "NLP", "TensorFlow", "PyTorch", "Scikit-learn",
+    "Pandas", "NumPy", "Matplotlib", "Seaborn", "Data Analysis", "Computer Vision"
+]
+
+# Compiled once at import instead of on every call.
+_SKILL_PATTERNS = [(skill, re.compile(r'\b' + re.escape(skill.lower()) + r'\b'))
+                   for skill in SKILLS]
+
+
+def extract_text_from_pdf(file_bytes: bytes) -> str | None:
+    """Extracts text content from the raw bytes of a PDF file."""
+    try:
+        with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+            return "".join(page.get_text("text") for page in doc)
+    except Exception as e:
+        logger.error(f"Error extracting PDF text: {e}")
+        return None
+
+
+def extract_text_from_docx(file_bytes: bytes) -> str | None:
+    """Extracts text content from the raw bytes of a DOCX file."""
+    try:
+        doc = docx.Document(io.BytesIO(file_bytes))
+        return "\n".join([para.text for para in doc.paragraphs])
+    except Exception as e:
+        logger.error(f"Error extracting DOCX text: {e}")
+        return None
+
+
+def extract_text(filename: str, file_bytes: bytes) -> str | None:
+    """
+    Extracts text from a resume, dispatching on the file extension.
+
+    Raises:
+        ValueError: If the file is neither a PDF nor a DOCX.
+    """
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext == "pdf":
+        return extract_text_from_pdf(file_bytes)
+    if ext == "docx":
+        return extract_text_from_docx(file_bytes)
+    raise ValueError("Unsupported file. Please upload a PDF or DOCX.")
+
+
+def extract_skills(text: str) -> List[str]:
+    """Returns the predefined skills mentioned in the given text."""
+    text_lower = text.lower()
+    return [skill for skill, pattern in _SKILL_PATTERNS if pattern.search(text_lower)]
+
+
+def parse_resume_file(filename: str, file_bytes: bytes) -> Dict[str, Any]:
+    """
+    Extracts skills from a single resume for batch ingestion. Runs in a worker
+    process, so failures are reported in the result instead of raised.
+
+    Returns:
+        {"filename", "skills"} on success or {"filename", "error"} on failure.
+    """
+    try:
+        text = extract_text(filename, file_bytes)
+    except ValueError as e:
+        return {"filename": filename, "error": str(e)}
+    if not text:
+        return {"filename": filename, "error": "Could not extract text from the resume."}
+    return {"filename": filename, "skills": extract_skills(text)}
@@ -1,45 +1,204 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.middleware.cors import CORSMiddleware
-import fitz  # PyMuPDF
-import re
-
-app = FastAPI()
-
-# Allow frontend to call backend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Predefined skills list
-SKILLS = [
-    "Python", "C++", "Java", "JavaScript", "React", "Node.js", "Express.js", "MongoDB",
-    "SQL", "R", "Matlab", "Git", "Docker", "Kubernetes", "AWS", "HTML", "CSS",
-    "Machine Learning", "Deep Learning", "NLP", "TensorFlow", "PyTorch", "Scikit-learn",
-    "Pandas", "NumPy", "Matplotlib", "Seaborn", "Data Analysis", "Computer Vision"
-]
-
-def extract_text_from_pdf(file_bytes):
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text("text")
-    return text
-
-def extract_skills(text):
-    found = []
-    text_lower = text.lower()
-    for skill in SKILLS:
-        if re.search(r'\b' + re.escape(skill.lower()) + r'\b', text_lower):
-            found.append(skill)
-    return list(set(found))
-
-@app.post("/upload-resume/")
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Tuple
+
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from extraction import extract_skills, extract_text_from_pdf, parse_resume_file
+
+# --- Constants ---
+# Individual resumes larger than this (uncompressed) are rejected per file.
+MAX_BATCH_FILE_BYTES = int(os.getenv("MAX_BATCH_FILE_BYTES", str(20 * 1024 * 1024)))
+BATCH_PARSE_WORKERS = int(os.getenv("BATCH_PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Files read but not yet parsed; bounds memory while a large archive streams in.
+MAX_PENDING_PARSES = BATCH_PARSE_WORKERS * 2
+
+# Mounted by the main application in server.py
+router = APIRouter()
+
+_parse_pool: ProcessPoolExecutor | None = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """
+    Lazily creates the process pool used to parse batch uploads across cores.
+
+    Workers are spawned rather than forked, so they never copy the server's
+    live threads or sockets. Spawned children do re-run the main script as
+    __mp_main__, which is why server.py keeps its module level free of side
+    effects (the Snowflake session is only opened by its lifespan hook).
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=BATCH_PARSE_WORKERS,
+                                          mp_context=multiprocessing.get_context("spawn"))
+    return _parse_pool
+
+
+def discard_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Drops a pool broken by a dead worker (e.g. a MuPDF crash or OOM kill) so
+    the next submission gets a fresh one instead of failing forever.
+    """
+    global _parse_pool
+    if _parse_pool is pool:
+        _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_resume(file_bytes: bytes) -> List[str] | None:
+    """Extracts the skills from a PDF resume. Blocking; run off the event loop."""
+    text = extract_text_from_pdf(file_bytes)
+    if text is None:
+        return None
+    return extract_skills(text)
+
+
+def spool_upload(upload: UploadFile) -> Tuple[str, BinaryIO]:
+    """
+    Copies an upload into a temporary file owned by the caller. FastAPI closes
+    UploadFiles when the endpoint returns, before a streamed body is consumed.
+    """
+    spooled = tempfile.TemporaryFile()
+    upload.file.seek(0)
+    shutil.copyfileobj(upload.file, spooled)
+    spooled.seek(0)
+    return upload.filename or "unnamed", spooled
+
+
+def iter_upload_members(filename: str, fileobj: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """
+    Yields {"filename", "bytes"} for each resume in an upload, or
+    {"filename", "error"} for entries that cannot be read. ZIP archives are
+    read member by member from disk, never as a whole.
+    """
+    if not filename.lower().endswith(".zip"):
+        data = fileobj.read(MAX_BATCH_FILE_BYTES + 1)
+        if len(data) > MAX_BATCH_FILE_BYTES:
+            yield {"filename": filename, "error": "File is too large."}
+        else:
+            yield {"filename": filename, "bytes": data}
+        return
+
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except (zipfile.BadZipFile, OSError, EOFError):
+        yield {"filename": filename, "error": "Not a valid ZIP archive."}
+        return
+
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if info.file_size > MAX_BATCH_FILE_BYTES:
+                yield {"filename": info.filename, "error": "File is too large."}
+                continue
+            # A damaged entry can raise zlib.error, EOFError (truncated) and
+            # more; any of them must fail just this file, not the batch.
+            try:
+                data = archive.read(info)
+            except Exception as e:
+                yield {"filename": info.filename, "error": f"Could not read archive entry: {e}"}
+                continue
+            yield {"filename": info.filename, "bytes": data}
+
+
+async def stream_batch_results(uploads: List[Tuple[str, BinaryIO]]) -> AsyncIterator[str]:
+    """
+    Parses every resume in the spooled uploads on the process pool and yields one
+    NDJSON line per file as soon as it finishes, followed by a summary line
+    with aggregate skill frequencies.
+    """
+    loop = asyncio.get_running_loop()
+    pending: Dict[asyncio.Future, Tuple[str, ProcessPoolExecutor]] = {}
+    skill_counts: Counter = Counter()
+    stats = {"files": 0, "succeeded": 0, "failed": 0}
+
+    def record(result: Dict[str, Any]) -> str:
+        stats["files"] += 1
+        if "error" in result:
+            stats["failed"] += 1
+        else:
+            stats["succeeded"] += 1
+            skill_counts.update(result["skills"])
+        return json.dumps(result) + "\n"
+
+    async def collect(return_when: str) -> List[str]:
+        done, _ = await asyncio.wait(pending, return_when=return_when)
+        lines = []
+        for future in done:
+            filename, pool = pending.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                discard_parse_pool(pool)
+                result = {"filename": filename, "error": "Parser crashed while processing this batch."}
+            except Exception as e:
+                result = {"filename": filename, "error": f"Parser failed: {e}"}
+            lines.append(record(result))
+        return lines
+
+    def submit(filename: str, file_bytes: bytes) -> bool:
+        # A pool can be found broken at submit time; retry once on a fresh one.
+        for _ in range(2):
+            pool = get_parse_pool()
+            try:
+                future = loop.run_in_executor(pool, parse_resume_file, filename, file_bytes)
+            except BrokenProcessPool:
+                discard_parse_pool(pool)
+                continue
+            pending[future] = (filename, pool)
+            return True
+        return False
+
+    try:
+        for filename, fileobj in uploads:
+            members = iter_upload_members(filename, fileobj)
+            while (member := await run_in_threadpool(next, members, None)) is not None:
+                if "error" in member:
+                    yield record(member)
+                    continue
+                if not submit(member["filename"], member["bytes"]):
+                    yield record({"filename": member["filename"], "error": "Parser is unavailable."})
+                    continue
+                if len(pending) >= MAX_PENDING_PARSES:
+                    for line in await collect(asyncio.FIRST_COMPLETED):
+                        yield line
+
+        while pending:
+            for line in await collect(asyncio.FIRST_COMPLETED):
+                yield line
+    finally:
+        for _, fileobj in uploads:
+            fileobj.close()
+
+    yield json.dumps({"summary": {**stats, "skill_counts": dict(skill_counts.most_common())}}) + "\n"
+
+
+@router.post("/upload-resume/")
 async def upload_resume(file: UploadFile = File(...)):
     file_bytes = await file.read()
-    text = extract_text_from_pdf(file_bytes)
-    skills = extract_skills(text)
+    skills = await run_in_threadpool(parse_resume, file_bytes)
+    if skills is None:
+        raise HTTPException(status_code=400, detail="Could not extract text from the uploaded resume.")
     return {"skills": skills}
+
+
+@router.post("/upload-resumes/")
+async def upload_resumes(files: List[UploadFile] = File(...)):
+    """
+    Batch ingestion: accepts any mix of PDF, DOCX and ZIP uploads and streams
+    back NDJSON, one line per resume plus a final summary line.
+    """
+    spooled = [await run_in_threadpool(spool_upload, upload) for upload in files]
+    return StreamingResponse(stream_batch_results(spooled), media_type="application/x-ndjson")
@@ -1,24 +1,55 @@
 import os
 import json
-import io
+import asyncio
+import ipaddress
+import logging
 import re
-import time
-from flask import Flask, request, jsonify, render_template
-from flask_cors import CORS
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from snowflake.snowpark import Session
 from dotenv import load_dotenv
-import fitz  # PyMuPDF
-import docx
 from typing import Dict, Any, List, Tuple
 
+from admission import (AdmissionController, AdmissionRejected, PRIORITY_CONTINUE,
+                       PRIORITY_GENERATE, PRIORITY_REFINE)
+from extraction import extract_skills, extract_text
+from resumeparser import router as resume_router
+from skill_index import SkillIndex
+
 # --- Initialization ---
 load_dotenv()
-app = Flask(__name__, template_folder='.')
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connects to Snowflake when the server starts, not when the module is imported."""
+    await run_in_threadpool(get_session)
+    yield
+    close_session()
+
+
+app = FastAPI(lifespan=lifespan)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Configure CORS to allow requests from all origins
-CORS(app, origins="*", 
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     allow_headers=["Content-Type", "Authorization"])
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+)
+
+# The resume parser API is served by the same application.
+app.include_router(resume_router)
+
+# Skill -> topic prerequisite index, compiled once at startup.
+skill_index = SkillIndex.load(os.path.join(BASE_DIR, 'skill_index.json'))
 
 # --- Constants ---json
 
@@ -28,6 +59,33 @@ CORS(app, origins="*",
 # --- Constants ---
 SNOWFLAKE_MODEL = 'snowflake-arctic'
 MAX_QUERY_RETRIES = 3
+# Status checks on an in-flight Cortex query start at CORTEX_POLL_INTERVAL
+# seconds and back off geometrically, so long generations cost a handful of
+# round trips instead of one every half second.
+CORTEX_POLL_INTERVAL = float(os.getenv("CORTEX_POLL_INTERVAL", "0.5"))
+CORTEX_MAX_POLL_INTERVAL = float(os.getenv("CORTEX_MAX_POLL_INTERVAL", "3"))
+CORTEX_POLL_BACKOFF = 1.5
+
+# Snowpark's client is blocking, so the short submit/poll/fetch calls run on a
+# small dedicated pool. No thread is held while the model is generating.
+cortex_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CORTEX_IO_THREADS", "8")),
+    thread_name_prefix="cortex")
+
+# --- Admission Control ---
+# Bounds how many Cortex queries are outstanding at once; the rest queue
+# briefly or get a 429.
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("CORTEX_MAX_CONCURRENT", "64")),
+    max_queue=int(os.getenv("CORTEX_MAX_QUEUE", "256")),
+    max_wait=float(os.getenv("CORTEX_MAX_QUEUE_WAIT", "30")),
+    client_rate=float(os.getenv("CLIENT_RATE_PER_SECOND", "0.2")),
+    client_burst=float(os.getenv("CLIENT_BURST", "5")),
+)
+# Reverse proxies (IPs or CIDRs, comma-separated) whose X-Forwarded-For is
+# believed. Without any, the socket peer address is the client identity.
+TRUSTED_PROXIES = [ipaddress.ip_network(p.strip(), strict=False)
+                   for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()]
 
 # ==============================================================================
 # --- AI PROMPT TEMPLATES ---
@@ -45,6 +103,9 @@ You are a world-class expert curriculum and career path designer. Your task is t
 *USER'S BACKGROUND (from resume, if provided):*
 {resume_context}
 
+*TOPICS THE USER ALREADY KNOWS (do NOT create phases or topics for these; start beyond them):*
+{known_topics}
+
 *CRITICAL INSTRUCTIONS:*
 1.  *TONE AND STYLE:* Be concise, crisp, and informative. Avoid verbose explanations. Get straight to the point.
 2.  *STRUCTURE:* Organize the roadmap into logical phases (e.g., "Phase 1: Foundational Skills", "Phase 2: Core Competencies", "Phase 3: Advanced Specialization").
@@ -159,40 +220,44 @@ connection_parameters = {
     "schema": os.getenv("SNOWFLAKE_SCHEMA"),
 }
 
-if not all(connection_parameters.values()):
-    raise ValueError(
-        "One or more Snowflake environment variables are not set. Please check your .env file.")
-
-try:
-    print("Connecting to Snowflake...")
-    session = Session.builder.configs(connection_parameters).create()
-    session.use_warehouse(connection_parameters["warehouse"])
-    print(
-        f"Successfully connected to Snowflake! Context: {session.get_fully_qualified_current_schema()}")
-except Exception as e:
-    raise ConnectionError(f"Failed to connect to Snowflake. Error: {e}")
+# Created lazily so importing this module (e.g. when a spawned worker
+# re-runs it as __mp_main__) never opens a connection.
+_session: Session | None = None
+_session_lock = threading.Lock()
 
-# --- Utility Functions ---
 
+def get_session() -> Session:
+    """Returns the shared Snowflake session, connecting on first use."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            return _session
 
-def extract_text_from_pdf(file_stream: io.BytesIO) -> str | None:
-    """Extracts text content from a PDF file stream."""
-    try:
-        doc = fitz.open(stream=file_stream.read(), filetype="pdf")
-        return "".join(page.get_text() for page in doc)
-    except Exception as e:
-        app.logger.error(f"Error extracting PDF text: {e}")
-        return None
+        if not all(connection_parameters.values()):
+            raise ValueError(
+                "One or more Snowflake environment variables are not set. Please check your .env file.")
 
+        try:
+            print("Connecting to Snowflake...")
+            session = Session.builder.configs(connection_parameters).create()
+            session.use_warehouse(connection_parameters["warehouse"])
+            print(
+                f"Successfully connected to Snowflake! Context: {session.get_fully_qualified_current_schema()}")
+        except Exception as e:
+            raise ConnectionError(f"Failed to connect to Snowflake. Error: {e}")
+        _session = session
+        return _session
+
+
+def close_session() -> None:
+    """Closes the shared Snowflake session if one was opened."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
 
-def extract_text_from_docx(file_stream: io.BytesIO) -> str | None:
-    """Extracts text content from a DOCX file stream."""
-    try:
-        doc = docx.Document(io.BytesIO(file_stream.read()))
-        return "\n".join([para.text for para in doc.paragraphs])
-    except Exception as e:
-        app.logger.error(f"Error extracting DOCX text: {e}")
-        return None
+# --- Utility Functions ---
 
 
 def escape_sql_string(value: str) -> str:
@@ -217,6 +282,66 @@ def is_prompt_valid(prompt: str) -> Tuple[bool, str]:
         return False, "Your request seems unclear. Please use descriptive language to specify your goal."
     return True, ""
 
+
+def build_initial_prompt(goal_prompt: str, resume_text: str, known: int) -> str:
+    """
+    Fills the initial generation template, listing the topics the user
+    already covers so the model does not spend output tokens on them.
+
+    Args:
+        goal_prompt: The user's goal, with current/target skill appended.
+        resume_text: Extracted resume text, or "Not provided.".
+        known: Bitmask of known topics from the skill index.
+    """
+    known_labels = skill_index.labels_for(known)
+    return INITIAL_PROMPT_TEMPLATE.format(
+        user_prompt=goal_prompt,
+        resume_context=resume_text,
+        known_topics=", ".join(known_labels) if known_labels else "None identified.")
+
+
+def is_trusted_proxy(host: str) -> bool:
+    """Checks whether an address belongs to a configured trusted proxy."""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def get_client_id(request: Request) -> str:
+    """
+    Identifies the caller for per-client rate limiting.
+
+    X-Forwarded-For is only honoured when the direct peer is a trusted proxy,
+    and then the right-most hop that isn't itself a trusted proxy is used.
+    Entries to the left of it are client-controlled and can be spoofed.
+    """
+    client_host = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(client_host):
+        return client_host
+
+    hops = [h.strip() for h in request.headers.get("X-Forwarded-For", "").split(",") if h.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else client_host
+
+
+async def read_json_body(request: Request) -> Dict[str, Any] | None:
+    """Parses a JSON object request body, returning None if it is missing or malformed."""
+    try:
+        data = await request.json()
+    except ValueError:  # json.JSONDecodeError and UnicodeDecodeError
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def rejected_response(rejection: AdmissionRejected) -> JSONResponse:
+    """Builds the 429 response used when admission control sheds a request."""
+    return JSONResponse({"error": rejection.reason}, status_code=429,
+                        headers={"Retry-After": str(rejection.retry_after)})
+
 # --- Data Format Converters ---
 
 
@@ -327,7 +452,52 @@ def convert_frontend_to_ai_format(frontend_roadmap: Dict[str, Any]) -> Dict[str,
 # --- Core AI and Parsing Logic ---
 
 
-def run_snowflake_query(prompt: str) -> Dict[str, Any]:
+async def run_cortex_complete(sql_query: str) -> str:
+    """
+    Submits a Cortex query asynchronously and awaits its result without
+    tying up a thread while the model is generating.
+    """
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(
+        cortex_executor, lambda: get_session().sql(sql_query).collect_nowait())
+    poll_interval = CORTEX_POLL_INTERVAL
+    while True:
+        await asyncio.sleep(poll_interval)
+        if await loop.run_in_executor(cortex_executor, job.is_done):
+            break
+        poll_interval = min(poll_interval * CORTEX_POLL_BACKOFF, CORTEX_MAX_POLL_INTERVAL)
+    rows = await loop.run_in_executor(cortex_executor, job.result)
+    return rows[0]['RESPONSE']
+
+
+def build_complete_sql(prompt: str) -> str:
+    """Builds the CORTEX.COMPLETE query for a prompt."""
+    safe_prompt = escape_sql_string(prompt)
+    return f"SELECT SNOWFLAKE.CORTEX.COMPLETE('{SNOWFLAKE_MODEL}', '{safe_prompt}') as response"
+
+
+def parse_roadmap_response(response_text: str) -> Dict[str, Any]:
+    """
+    Extracts and validates the roadmap JSON object from raw model output.
+
+    Raises:
+        ValueError: If no valid roadmap object is found (includes JSONDecodeError).
+    """
+    # The model may sometimes wrap the JSON in markdown, so we extract it.
+    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+    if not json_match:
+        raise ValueError("No JSON object found in AI response.")
+
+    parsed_json = json.loads(json_match.group(0))
+
+    # Basic validation of the parsed JSON structure
+    if "roadmap" in parsed_json and isinstance(parsed_json["roadmap"], list):
+        return parsed_json
+    raise ValueError(
+        f"AI response JSON did not contain the expected 'roadmap' list. Found keys: {list(parsed_json.keys())}")
+
+
+async def run_snowflake_query(prompt: str) -> Dict[str, Any]:
     """
     Executes a query against the Snowflake Cortex LLM, with retry logic and JSON parsing.
 
@@ -339,34 +509,19 @@ def run_snowflake_query(prompt: str) -> Dict[str, Any]:
     """
     for attempt in range(MAX_QUERY_RETRIES):
         try:
-            safe_prompt = escape_sql_string(prompt)
-            sql_query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('{SNOWFLAKE_MODEL}', '{safe_prompt}') as response"
-
             # Execute the query and get the raw text response
-            response_text = session.sql(sql_query).collect()[0]['RESPONSE']
-
-            # The model may sometimes wrap the JSON in markdown, so we extract it.
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if not json_match:
-                raise ValueError("No JSON object found in AI response.")
-
-            parsed_json = json.loads(json_match.group(0))
-
-            # Basic validation of the parsed JSON structure
-            if "roadmap" in parsed_json and isinstance(parsed_json["roadmap"], list):
-                print(
-                    f"Successfully parsed AI response on attempt {attempt + 1}.")
-                return parsed_json
-            else:
-                raise ValueError(
-                    f"AI response JSON did not contain the expected 'roadmap' list. Found keys: {list(parsed_json.keys())}")
+            response_text = await run_cortex_complete(build_complete_sql(prompt))
+            parsed_json = parse_roadmap_response(response_text)
+            print(
+                f"Successfully parsed AI response on attempt {attempt + 1}.")
+            return parsed_json
 
         except (json.JSONDecodeError, ValueError, IndexError) as e:
-            app.logger.error(
+            logger.error(
                 f"Attempt {attempt + 1}/{MAX_QUERY_RETRIES} failed: {e}. Retrying...")
             if attempt + 1 == MAX_QUERY_RETRIES:
                 return {"error": f"The AI model failed to generate a valid response. Last error: {str(e)}"}
-            time.sleep(1)  # Wait before retrying
+            await asyncio.sleep(1)  # Wait before retrying
 
     return {"error": "An unknown error occurred after all retries."}
 
@@ -401,22 +556,31 @@ def generate_chat_summary(old_roadmap: dict, new_roadmap: dict) -> str:
         # Fallback for any comparison errors
         return "I have updated the roadmap based on your feedback."
 
-# --- Flask API Endpoints ---
+# --- API Endpoints ---
 
 
-@app.route('/')
-def index():
+@app.get('/')
+async def index():
     """Serves the main HTML page."""
-    return render_template('index_cb.html')
+    return FileResponse(os.path.join(BASE_DIR, 'index_cb.html'))
 
 
-@app.route('/generate-roadmap', methods=['POST'])
-def handle_initial_request():
+@app.get('/metrics')
+async def metrics():
+    """Exposes admission queue depth and wait times for Prometheus."""
+    return PlainTextResponse(admission.render_metrics(),
+                             media_type="text/plain; version=0.0.4")
+
+
+@app.post('/generate-roadmap')
+async def handle_initial_request(request: Request,
+                                 prompt: str | None = Form(None),
+                                 resume: UploadFile | None = File(None)):
     """Endpoint to generate the initial learning roadmap."""
-    goal_prompt = request.form.get('prompt')
+    goal_prompt = prompt
     is_valid, error_msg = is_prompt_valid(goal_prompt)
     if not is_valid:
-        return jsonify({"error": error_msg}), 400
+        return JSONResponse({"error": error_msg}, status_code=400)
 
     # Append default context if not provided by the user, which helps the AI.
     if "current skill:" not in goal_prompt.lower():
@@ -425,52 +589,59 @@ def handle_initial_request():
         goal_prompt += "\nTarget Skill: Expert"
 
     resume_text = "Not provided."
-    if 'resume' in request.files and request.files['resume'].filename != '':
-        resume_file = request.files['resume']
-        ext = os.path.splitext(resume_file.filename)[1].lower()
-        if ext == '.pdf':
-            resume_text = extract_text_from_pdf(resume_file)
-        elif ext == '.docx':
-            resume_text = extract_text_from_docx(resume_file)
-        else:
-            return jsonify({"error": "Unsupported file. Please upload a PDF or DOCX."}), 400
+    known_topics = 0
+    if resume is not None and resume.filename:
+        file_bytes = await resume.read()
+        try:
+            resume_text = await run_in_threadpool(extract_text, resume.filename, file_bytes)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
         if not resume_text:
-            return jsonify({"error": "Could not extract text from the uploaded resume."}), 500
+            return JSONResponse({"error": "Could not extract text from the uploaded resume."}, status_code=500)
+        known_topics = skill_index.known_mask(extract_skills(resume_text))
 
     # Build the full prompt from the template
-    full_prompt = INITIAL_PROMPT_TEMPLATE.format(
-        user_prompt=goal_prompt, resume_context=resume_text)
+    full_prompt = build_initial_prompt(goal_prompt, resume_text, known_topics)
 
-    ai_response = run_snowflake_query(full_prompt)
+    try:
+        async with admission.admit(get_client_id(request), PRIORITY_GENERATE):
+            ai_response = await run_snowflake_query(full_prompt)
+    except AdmissionRejected as rejection:
+        return rejected_response(rejection)
     if 'error' in ai_response:
-        return jsonify(ai_response), 500
-
-    frontend_roadmap = convert_ai_to_frontend_format(ai_response)
+        return JSONResponse(ai_response, status_code=500)
 
     # Check if the AI generated a reasonably complete roadmap already
     num_phases = len(ai_response.get("roadmap", []))
+
+    # The model doesn't always honour the skip list, so drop any foundational
+    # topics the user already knows before building the node graph.
+    skill_index.prune_roadmap(ai_response, known_topics)
+    frontend_roadmap = convert_ai_to_frontend_format(ai_response)
     is_complete = num_phases >= 3
     message = "Generated initial phase(s)." if not is_complete else "Successfully generated the complete roadmap."
 
-    return jsonify({
+    return JSONResponse({
         "roadmap": frontend_roadmap,
         "message": message,
         "is_complete": is_complete
-    }), 200
+    }, status_code=200)
 
 
-@app.route('/refine-roadmap', methods=['POST'])
-def handle_refinement_request():
+@app.post('/refine-roadmap')
+async def handle_refinement_request(request: Request):
     """Endpoint to modify an existing roadmap based on user chat input."""
-    data = request.get_json()
+    data = await read_json_body(request)
+    if data is None:
+        return JSONResponse({"error": "Request body must be a JSON object."}, status_code=400)
     chat_message = data.get('chat_message')
     current_frontend_roadmap = data.get('current_roadmap')
 
     is_valid, error_msg = is_prompt_valid(chat_message)
     if not is_valid:
-        return jsonify({"error": error_msg}), 400
+        return JSONResponse({"error": error_msg}, status_code=400)
     if not current_frontend_roadmap:
-        return jsonify({"error": "Current roadmap is missing from the request."}), 400
+        return JSONResponse({"error": "Current roadmap is missing from the request."}, status_code=400)
 
     current_ai_roadmap = convert_frontend_to_ai_format(
         current_frontend_roadmap)
@@ -480,9 +651,13 @@ def handle_refinement_request():
         user_command=chat_message
     )
 
-    modified_ai_roadmap = run_snowflake_query(refinement_prompt)
+    try:
+        async with admission.admit(get_client_id(request), PRIORITY_REFINE):
+            modified_ai_roadmap = await run_snowflake_query(refinement_prompt)
+    except AdmissionRejected as rejection:
+        return rejected_response(rejection)
     if 'error' in modified_ai_roadmap:
-        return jsonify(modified_ai_roadmap), 500
+        return JSONResponse(modified_ai_roadmap, status_code=500)
 
     # Convert nested roadmap structure to nodes and edges format
     def convert_nested_to_nodes_edges(nested_roadmap):
@@ -567,20 +742,22 @@ def handle_refinement_request():
     summary_message = generate_chat_summary(
         current_frontend_roadmap, modified_frontend_roadmap)
     
-    return jsonify({
+    return JSONResponse({
         "roadmap": modified_frontend_roadmap,
         "message": summary_message,
         "is_complete": True  # A refinement is always a "complete" action
-    }), 200
+    }, status_code=200)
 
 
-@app.route('/continue-roadmap', methods=['POST'])
-def handle_continuation_request():
+@app.post('/continue-roadmap')
+async def handle_continuation_request(request: Request):
     """Endpoint to generate the next phase of a roadmap."""
-    data = request.get_json()
+    data = await read_json_body(request)
+    if data is None:
+        return JSONResponse({"error": "Request body must be a JSON object."}, status_code=400)
     current_frontend_roadmap = data.get('current_roadmap')
     if not current_frontend_roadmap:
-        return jsonify({"error": "Current roadmap is missing from the request."}), 400
+        return JSONResponse({"error": "Current roadmap is missing from the request."}, status_code=400)
 
     # Convert to AI format to provide as context
     current_ai_roadmap = convert_frontend_to_ai_format(
@@ -593,13 +770,17 @@ def handle_continuation_request():
     )
 
     # The AI will return just the new part of the roadmap
-    new_roadmap_part = run_snowflake_query(continuation_prompt)
+    try:
+        async with admission.admit(get_client_id(request), PRIORITY_CONTINUE):
+            new_roadmap_part = await run_snowflake_query(continuation_prompt)
+    except AdmissionRejected as rejection:
+        return rejected_response(rejection)
     if 'error' in new_roadmap_part:
-        return jsonify(new_roadmap_part), 500
+        return JSONResponse(new_roadmap_part, status_code=500)
 
     # If the AI returns an empty list, the roadmap is complete.
     if not new_roadmap_part.get('roadmap'):
-        return jsonify({
+        return JSONResponse({
             "roadmap": current_frontend_roadmap,
             "message": "Roadmap generation is complete!",
             "is_complete": True
@@ -613,13 +794,16 @@ def handle_continuation_request():
     updated_frontend_roadmap = convert_ai_to_frontend_format(
         current_ai_roadmap)
 
-    return jsonify({
+    return JSONResponse({
         "roadmap": updated_frontend_roadmap,
         "message": f"Generated phase: {new_roadmap_part['roadmap'][0].get('phase', '')}",
         "is_complete": False
-    }), 200
+    }, status_code=200)
 
 
 # --- Main Execution ---
+# Single process. For several workers, let uvicorn import the app itself:
+#   uvicorn server:app --port 5001 --workers N
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    import uvicorn
+    uvicorn.run(app, port=5001)
\ No newline at end of file
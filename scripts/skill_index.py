@@ -0,0 +1,117 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List
+
+# Only foundational topics are pruned; an "Advanced Git Workflows" topic still
+# teaches the user something new even if they list Git on their resume.
+PRUNABLE_DIFFICULTIES = {"beginner"}
+
+
+class SkillIndex:
+    """
+    Precomputed map from resume skills to canonical roadmap topics and their
+    prerequisite DAG.
+
+    Topics are stored as bit positions. Each skill maps to a single int mask
+    covering the topics it implies plus all of their transitive
+    prerequisites, so resolving a resume is one OR per skill.
+    """
+
+    def __init__(self, topics: Dict[str, Dict[str, Any]]):
+        self.topic_ids: List[str] = list(topics)
+        self.labels: List[str] = [topics[t].get("label", t) for t in self.topic_ids]
+        bit_of = {topic_id: i for i, topic_id in enumerate(self.topic_ids)}
+
+        closures: Dict[str, int] = {}
+
+        def closure(topic_id: str, path: tuple) -> int:
+            if topic_id in closures:
+                return closures[topic_id]
+            if topic_id in path:
+                raise ValueError(f"Prerequisite cycle: {' -> '.join(path + (topic_id,))}")
+            if topic_id not in bit_of:
+                raise ValueError(f"Unknown prerequisite topic '{topic_id}'.")
+            mask = 1 << bit_of[topic_id]
+            for prereq in topics[topic_id].get("prerequisites", []):
+                mask |= closure(prereq, path + (topic_id,))
+            closures[topic_id] = mask
+            return mask
+
+        self.skill_masks: Dict[str, int] = {}
+        for topic_id, topic in topics.items():
+            mask = closure(topic_id, ())
+            for skill in topic.get("skills", []):
+                key = skill.lower()
+                self.skill_masks[key] = self.skill_masks.get(key, 0) | mask
+
+        # One compiled pattern per topic, matched against roadmap topic titles.
+        self.title_patterns = [
+            re.compile(r'\b(?:' + '|'.join(re.escape(k.lower())
+                       for k in topics[t].get("keywords", [])) + r')\b')
+            if topics[t].get("keywords") else None
+            for t in self.topic_ids
+        ]
+
+    @classmethod
+    def load(cls, path: str) -> "SkillIndex":
+        """Loads and compiles the index from its JSON definition."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["topics"])
+
+    def known_mask(self, skills: Iterable[str]) -> int:
+        """Returns the bitmask of topics covered by the given skills."""
+        mask = 0
+        for skill in skills:
+            mask |= self.skill_masks.get(skill.lower(), 0)
+        return mask
+
+    def labels_for(self, mask: int) -> List[str]:
+        """Returns the human-readable labels of the topics in a mask."""
+        return [label for i, label in enumerate(self.labels) if mask >> i & 1]
+
+    def is_known_topic(self, title: str, difficulty: str | None, known: int) -> bool:
+        """
+        Checks whether a generated roadmap topic repeats something the user
+        already knows.
+
+        Args:
+            title: The topic name produced by the AI.
+            difficulty: The topic's difficulty; only foundational topics are pruned.
+            known: Bitmask returned by known_mask().
+        """
+        if not known or not title or str(difficulty or "").lower() not in PRUNABLE_DIFFICULTIES:
+            return False
+        title_lower = str(title).lower()
+        for i, pattern in enumerate(self.title_patterns):
+            if known >> i & 1 and pattern is not None and pattern.search(title_lower):
+                return True
+        return False
+
+    def prune_roadmap(self, ai_roadmap: Dict[str, Any], known: int) -> int:
+        """
+        Removes already-known topics from an AI-format roadmap in place and
+        drops phases left empty. Malformed topics are left for the converter
+        to handle, and a roadmap that would be pruned to nothing is kept as is.
+
+        Returns:
+            The number of topics removed.
+        """
+        if not known:
+            return 0
+        removed = 0
+        kept_phases = []
+        for phase in ai_roadmap.get("roadmap", []):
+            if not isinstance(phase, dict):
+                kept_phases.append(phase)
+                continue
+            topics = phase.get("topics") or []
+            kept = [t for t in topics
+                    if not (isinstance(t, dict) and self.is_known_topic(
+                        t.get("topic") or "", t.get("difficulty"), known))]
+            removed += len(topics) - len(kept)
+            if kept:
+                kept_phases.append({**phase, "topics": kept})
+        if not kept_phases:
+            return 0
+        ai_roadmap["roadmap"] = kept_phases
+        return removed
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from admission import AdmissionController, AdmissionRejected, PRIORITY_GENERATE, PRIORITY_REFINE
+
+
+def test_waiters_fill_every_slot_released_at_once():
+    """Two slots freed together must admit both queued waiters, not just the head."""
+    async def scenario():
+        controller = AdmissionController(max_concurrent=2, max_queue=10, max_wait=3.0,
+                                         client_rate=100, client_burst=100)
+        release = asyncio.Event()
+        finish = asyncio.Event()
+        admitted_at = {}
+        started = time.monotonic()
+
+        async def holder(name):
+            async with controller.admit(name, PRIORITY_GENERATE):
+                await release.wait()
+
+        async def waiter(name, priority):
+            async with controller.admit(name, priority):
+                admitted_at[name] = time.monotonic() - started
+                # Keep the slot so a release can't mask a missed wakeup.
+                await finish.wait()
+
+        holders = [asyncio.create_task(holder(f"holder{i}")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        # The low-priority waiter queues first so it is woken before the head.
+        low = asyncio.create_task(waiter("B_low", PRIORITY_GENERATE))
+        await asyncio.sleep(0.01)
+        high = asyncio.create_task(waiter("A_high", PRIORITY_REFINE))
+        await asyncio.sleep(0.05)
+
+        release.set()
+        await asyncio.sleep(1.0)
+        finish.set()
+        await asyncio.gather(*holders, low, high)
+        return admitted_at
+
+    admitted_at = asyncio.run(scenario())
+    assert admitted_at["A_high"] < 1.0
+    assert admitted_at["B_low"] < 1.0
+
+
+def test_shed_requests_do_not_spend_client_budget():
+    """A request rejected because the queue is full keeps the client's token."""
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=0, max_wait=1.0,
+                                         client_rate=0.001, client_burst=2)
+        release = asyncio.Event()
+
+        async def holder():
+            async with controller.admit("other", PRIORITY_GENERATE):
+                await release.wait()
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0.01)
+        for _ in range(5):
+            try:
+                async with controller.admit("client", PRIORITY_GENERATE):
+                    pass
+            except AdmissionRejected as rejection:
+                assert "busy" in rejection.reason
+        release.set()
+        await holding
+
+        # Both burst tokens are still available once capacity frees up.
+        for _ in range(2):
+            async with controller.admit("client", PRIORITY_GENERATE):
+                pass
+
+    asyncio.run(scenario())
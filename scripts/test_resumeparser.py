@@ -0,0 +1,109 @@
+import asyncio
+import io
+import json
+import os
+import struct
+import zipfile
+
+import pytest
+
+pytest.importorskip("fastapi")
+fitz = pytest.importorskip("fitz")
+
+import resumeparser  # noqa: E402
+
+
+def make_pdf(text: str) -> bytes:
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    return doc.tobytes()
+
+
+def make_zip(entries, compression=zipfile.ZIP_DEFLATED) -> io.BytesIO:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def corrupt_entry(buf: io.BytesIO, name: str) -> io.BytesIO:
+    """Flips the compressed bytes of one entry, leaving headers intact."""
+    raw = bytearray(buf.getvalue())
+    info = zipfile.ZipFile(io.BytesIO(bytes(raw))).getinfo(name)
+    name_len, extra_len = struct.unpack("<HH", raw[info.header_offset + 26:info.header_offset + 30])
+    start = info.header_offset + 30 + name_len + extra_len
+    for i in range(start, start + min(info.compress_size, 16)):
+        raw[i] ^= 0xFF
+    return io.BytesIO(bytes(raw))
+
+
+def members(filename, fileobj):
+    return list(resumeparser.iter_upload_members(filename, fileobj))
+
+
+def run_batch(uploads):
+    async def collect():
+        return [line async for line in resumeparser.stream_batch_results(uploads)]
+    return [json.loads(line) for line in asyncio.run(collect())]
+
+
+def crash_on_request(filename: str, file_bytes: bytes):
+    """Stands in for parse_resume_file; kills its worker like a native crash would."""
+    if filename == "crash.pdf":
+        os._exit(1)
+    return {"filename": filename, "skills": []}
+
+
+def test_corrupt_entry_fails_only_that_file():
+    buf = corrupt_entry(make_zip([("bad.pdf", b"x" * 4096), ("good.pdf", b"ok")]), "bad.pdf")
+
+    result = members("batch.zip", buf)
+
+    assert result[0]["filename"] == "bad.pdf"
+    assert result[0]["error"].startswith("Could not read archive entry")
+    assert result[1] == {"filename": "good.pdf", "bytes": b"ok"}
+
+
+def test_oversized_entry_is_rejected_without_reading(monkeypatch):
+    monkeypatch.setattr(resumeparser, "MAX_BATCH_FILE_BYTES", 10)
+    buf = make_zip([("big.pdf", b"x" * 11), ("small.pdf", b"x" * 10)])
+
+    result = members("batch.zip", buf)
+
+    assert result == [{"filename": "big.pdf", "error": "File is too large."},
+                      {"filename": "small.pdf", "bytes": b"x" * 10}]
+
+
+def test_plain_and_invalid_uploads():
+    assert members("cv.pdf", io.BytesIO(b"%PDF")) == [{"filename": "cv.pdf", "bytes": b"%PDF"}]
+    assert members("cv.zip", io.BytesIO(b"not a zip")) == [
+        {"filename": "cv.zip", "error": "Not a valid ZIP archive."}]
+
+
+def test_stream_ends_with_summary():
+    archive = corrupt_entry(make_zip([("bad.pdf", b"x" * 4096),
+                                      ("a.pdf", make_pdf("Python and SQL"))]), "bad.pdf")
+    uploads = [("batch.zip", archive),
+               ("b.pdf", io.BytesIO(make_pdf("Python, Git"))),
+               ("notes.txt", io.BytesIO(b"Python"))]
+
+    lines = run_batch(uploads)
+
+    by_name = {line["filename"]: line for line in lines[:-1]}
+    assert set(by_name) == {"bad.pdf", "a.pdf", "b.pdf", "notes.txt"}
+    assert "error" in by_name["bad.pdf"] and "error" in by_name["notes.txt"]
+    assert lines[-1] == {"summary": {"files": 4, "succeeded": 2, "failed": 2,
+                                     "skill_counts": {"Python": 2, "SQL": 1, "Git": 1}}}
+
+
+def test_crashed_worker_does_not_break_later_batches(monkeypatch):
+    monkeypatch.setattr(resumeparser, "parse_resume_file", crash_on_request)
+
+    first = run_batch([("crash.pdf", io.BytesIO(b"x"))])
+    second = run_batch([("ok.pdf", io.BytesIO(b"x"))])
+
+    assert "error" in first[0] and first[-1]["summary"]["failed"] == 1
+    assert second[0] == {"filename": "ok.pdf", "skills": []}
+    assert second[-1]["summary"]["succeeded"] == 1
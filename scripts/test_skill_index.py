@@ -0,0 +1,98 @@
+import copy
+import os
+
+import pytest
+
+from skill_index import SkillIndex
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_index.json")
+
+TOPICS = {
+    "basics": {"label": "Basics", "skills": [], "keywords": ["programming basics"], "prerequisites": []},
+    "python": {"label": "Python", "skills": ["Python"], "keywords": ["python basics"],
+               "prerequisites": ["basics"]},
+    "pandas": {"label": "Pandas", "skills": ["Pandas"], "keywords": ["pandas basics"],
+               "prerequisites": ["python"]},
+    "git": {"label": "Git", "skills": ["Git"], "keywords": ["git basics"], "prerequisites": []},
+}
+
+
+def topic(title, difficulty="Beginner"):
+    return {"topic": title, "estimated_time": "1 Week", "difficulty": difficulty, "sub_steps": []}
+
+
+@pytest.fixture
+def index():
+    return SkillIndex(TOPICS)
+
+
+def test_skill_implies_transitive_prerequisites(index):
+    assert index.labels_for(index.known_mask(["pandas"])) == ["Basics", "Python", "Pandas"]
+    assert index.labels_for(index.known_mask(["Git", "Unknown"])) == ["Git"]
+    assert index.known_mask([]) == 0
+
+
+def test_cycles_and_unknown_prerequisites_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        SkillIndex({"a": {"prerequisites": ["b"]}, "b": {"prerequisites": ["a"]}})
+    with pytest.raises(ValueError, match="Unknown prerequisite"):
+        SkillIndex({"a": {"prerequisites": ["missing"]}})
+
+
+def test_only_beginner_topics_are_pruned(index):
+    known = index.known_mask(["Python"])
+    assert index.is_known_topic("Python Basics", "Beginner", known)
+    assert not index.is_known_topic("Python Basics", "Intermediate", known)
+    assert not index.is_known_topic("Python Basics", None, known)
+    assert not index.is_known_topic("Pandas Basics", "Beginner", known)
+
+
+def test_prune_drops_known_topics_and_empty_phases(index):
+    roadmap = {"roadmap": [
+        {"phase": "Phase 1", "topics": [topic("Programming Basics"), topic("Python Basics")]},
+        {"phase": "Phase 2", "topics": [topic("Git Basics"), topic("Testing")]},
+    ]}
+
+    removed = index.prune_roadmap(roadmap, index.known_mask(["Python"]))
+
+    assert removed == 2
+    assert roadmap == {"roadmap": [
+        {"phase": "Phase 2", "topics": [topic("Git Basics"), topic("Testing")]}]}
+
+
+def test_prune_tolerates_null_titles_and_malformed_topics(index):
+    roadmap = {"roadmap": [
+        {"phase": "Phase 1", "topics": [{"topic": None, "difficulty": "Beginner"},
+                                        "not a dict", topic("Python Basics")]},
+        "not a phase",
+    ]}
+
+    removed = index.prune_roadmap(roadmap, index.known_mask(["Python"]))
+
+    assert removed == 1
+    assert roadmap["roadmap"][0]["topics"] == [{"topic": None, "difficulty": "Beginner"}, "not a dict"]
+    assert roadmap["roadmap"][1] == "not a phase"
+
+
+def test_prune_keeps_roadmap_that_would_become_empty(index):
+    roadmap = {"roadmap": [{"phase": "Phase 1", "topics": [topic("Python Basics")]}]}
+    original = copy.deepcopy(roadmap)
+
+    assert index.prune_roadmap(roadmap, index.known_mask(["Python"])) == 0
+    assert roadmap == original
+
+
+def test_shipped_index_only_prunes_foundational_titles():
+    index = SkillIndex.load(INDEX_PATH)
+    python = index.known_mask(["Python"])
+
+    assert index.is_known_topic("Introduction to Python", "Beginner", python)
+    assert not index.is_known_topic("Learn Python OOP", "Beginner", python)
+    assert not index.is_known_topic("Python Programming for Data", "Beginner", python)
+
+
+def test_shipped_index_ignores_weak_skill_signals():
+    index = SkillIndex.load(INDEX_PATH)
+
+    assert index.known_mask(["R"]) == 0
+    assert index.known_mask(["NLP", "Computer Vision"]) == 0